@@ -3,9 +3,11 @@ from fastapi.responses import StreamingResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
+from starlette.background import BackgroundTask
 from .translator import translate_pdf_en2zh
 from .translator_html import translate_html
 from .translator_image import translate_image_bytes
+from .uploads import UploadLimitMiddleware, spool_upload, read_upload, new_output_path, remove_quietly
 
 app = FastAPI(title="PDF EN->ZH Translator")
 
@@ -24,6 +26,9 @@ if (Path(FRONTEND_DIR) / "index.html").exists():
         # Serve the SPA entrypoint for GET / requests only.
         return FileResponse(Path(FRONTEND_DIR) / "index.html")
 
+# Enforce MAX_UPLOAD_MB on the raw request body, before multipart parsing spools it
+app.add_middleware(UploadLimitMiddleware)
+
 # Allow local front-end (http://localhost:8080) to call this API during development
 # During local development it's often easiest to allow all origins to avoid
 # subtle origin-matching issues between localhost/127.0.0.1 and different
@@ -43,6 +48,7 @@ async def translate(
     dpi: int = Form(144),
     batch_size: int = Form(12),
     font_ttf: UploadFile | None = File(None),
+    doc_id: str | None = Form(None),  # 同一文档的不同版本共用；不传则不做增量
 ):
     # quick debug logging to help diagnose 422 / missing field issues
     print(f"[translate] Received request: direction={direction}, dpi={dpi}, batch_size={batch_size}")
@@ -53,31 +59,45 @@ async def translate(
     if direction != "en2zh":
         return Response("Only en2zh is supported.", status_code=400)
 
-    # read uploaded bytes
-    pdf_bytes = await pdf.read()
-    font_bytes = await font_ttf.read() if font_ttf else None
+    # spool uploads to disk in chunks (size limit enforced while streaming)
+    pdf_path = font_path = out_path = None
+    try:
+        pdf_path = await spool_upload(pdf, suffix=".pdf")
+        font_path = await spool_upload(font_ttf, suffix=".ttf") if font_ttf else None
+        out_path = new_output_path(suffix=".pdf")
 
-    out_pdf = await translate_pdf_en2zh(
-        pdf_bytes=pdf_bytes,
-        dpi=dpi,
-        batch_size=batch_size,
-        font_bytes=font_bytes,
-    )
+        await translate_pdf_en2zh(
+            pdf_path=pdf_path,
+            out_path=out_path,
+            dpi=dpi,
+            batch_size=batch_size,
+            font_path=font_path,
+            doc_id=doc_id or None,
+        )
+    except BaseException:
+        remove_quietly(pdf_path, font_path, out_path)
+        raise
     out_name = f"translated-{pdf.filename or 'translated.pdf'}"
     headers = {
-        "Content-Disposition": f'attachment; filename="{out_name}"',
         "Cache-Control": "no-store, no-cache, must-revalidate, max-age=0",
         "Pragma": "no-cache",
         "Expires": "0",
     }
-    # Return a full Response with explicit no-cache headers to ensure browsers don't reuse old files
-    return Response(content=out_pdf, media_type="application/pdf", headers=headers)
+    # Stream the result from disk (FileResponse handles Range requests) with explicit
+    # no-cache headers; temp files are removed once the response has been sent.
+    return FileResponse(
+        out_path,
+        media_type="application/pdf",
+        filename=out_name,
+        headers=headers,
+        background=BackgroundTask(remove_quietly, pdf_path, font_path, out_path),
+    )
 
 
 @app.post("/api/translate_html")
 async def api_translate_html(html: UploadFile = File(...)):
     """Accept an uploaded HTML file and return a translated HTML document."""
-    data = await html.read()
+    data = await read_upload(html)
     out = translate_html(data.decode("utf-8", errors="ignore"))
     return Response(content=out.encode("utf-8"), media_type="text/html; charset=utf-8",
                     headers={"Cache-Control": "no-store"})
@@ -86,6 +106,6 @@ async def api_translate_html(html: UploadFile = File(...)):
 @app.post("/api/translate_image")
 async def api_translate_image(image: UploadFile = File(...), font_path: str = Form(None)):
     """Accept an uploaded image and return a translated PNG image."""
-    img = await image.read()
+    img = await read_upload(image)
     out = translate_image_bytes(img, font_path)
     return Response(content=out, media_type="image/png", headers={"Cache-Control": "no-store"})
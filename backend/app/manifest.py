@@ -0,0 +1,150 @@
+import functools
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+import fitz
+from diskcache import Cache
+
+MANIFEST_DIR = os.environ.get("MANIFEST_DIR", ".cache_manifest")
+_OUTPUT_DIR = os.path.join(MANIFEST_DIR, "outputs")
+# Unreferenced outputs younger than this may belong to a store() in progress
+_SWEEP_GRACE = 60 * 60
+
+_manifests = Cache(MANIFEST_DIR)
+
+
+def _doc_key(doc_id: str) -> str:
+    return hashlib.sha1(doc_id.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str | None) -> str:
+    if not path:
+        return ""
+    st = os.stat(path)
+    return _file_digest(path, st.st_mtime_ns, st.st_size)
+
+
+@functools.lru_cache(maxsize=32)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    # mtime/size 参与缓存键，文件被替换后自动失效
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _stream_digest(doc: fitz.Document, xref: int, digests: dict) -> bytes:
+    # 原始（未解压）流的摘要，按 xref 缓存，跨页共享的资源只算一次
+    if xref not in digests:
+        h = hashlib.sha1(doc.xref_object(xref, compressed=True).encode("utf-8"))
+        if doc.xref_is_stream(xref):
+            h.update(doc.xref_stream_raw(xref) or b"")
+        digests[xref] = h.digest()
+    return digests[xref]
+
+
+def page_fingerprint(page: fitz.Page, blocks, render_key: str, digests: dict) -> str:
+    """Hash the inputs that determine a page's rendered output.
+
+    Covers the page geometry, the extracted text blocks with their bbox, the
+    raw content stream, every font dictionary, image (and soft mask) and form
+    XObject the page references, and each annotation's properties (minus its
+    timestamps) and appearance stream. Streams are hashed raw (still
+    compressed) and memoized per xref in digests, so unchanged scans are never
+    decoded and shared resources are hashed once. Changes confined to other
+    named resources (shadings, patterns, graphics states) are not detected.
+
+    Object dictionaries embed xref numbers, so a revision that renumbers
+    objects misses the cache (a full re-render), never the other way round.
+    """
+    doc = page.parent
+    h = hashlib.sha1(render_key.encode("utf-8"))
+    h.update(repr((tuple(round(v, 1) for v in page.rect), page.rotation)).encode())
+    for b in blocks:
+        h.update(repr(tuple(round(v, 1) for v in b["bbox"])).encode())
+        h.update(b["text"].encode("utf-8"))
+    h.update(page.read_contents())
+    xrefs = [f[0] for f in page.get_fonts(full=True)]
+    xrefs += [x[0] for x in page.get_xobjects()]
+    xrefs += [x for img in page.get_images(full=True) for x in img[:2]]  # image and its soft mask
+    for xref in xrefs:
+        if xref > 0:
+            h.update(_stream_digest(doc, xref, digests))
+    for annot in page.annots():
+        info = {k: v for k, v in annot.info.items() if k not in ("creationDate", "modDate")}
+        h.update(repr((annot.type, tuple(annot.rect), info, annot.colors, annot.flags,
+                       annot.border, annot.opacity)).encode("utf-8"))
+        kind, ap = doc.xref_get_key(annot.xref, "AP/N")
+        if kind == "xref":
+            h.update(_stream_digest(doc, int(ap.split()[0]), digests))
+    return h.hexdigest()
+
+
+def load(doc_id: str):
+    """Return (fingerprints, output_path) of the last translated revision, or None.
+
+    fingerprints[i] is the fingerprint of page i; output_path is the rendered
+    PDF it belongs to.
+    """
+    m = _manifests.get(_doc_key(doc_id))
+    if not m or not os.path.exists(m["output"]):
+        return None
+    return m["fingerprints"], m["output"]
+
+
+def store(doc_id: str, fingerprints: list[str], rendered_path: str, expire=60 * 60 * 24 * 30) -> None:
+    """Record rendered_path as the latest revision of doc_id.
+
+    The PDF is copied into the manifest dir under a name derived from its
+    fingerprints, so concurrent jobs never overwrite a file another job may
+    still be reading. The previous revision's copy, and any copy whose key
+    has expired, is removed afterwards.
+    """
+    key = _doc_key(doc_id)
+    digest = hashlib.sha1("".join(fingerprints).encode("ascii")).hexdigest()[:16]
+    os.makedirs(_OUTPUT_DIR, exist_ok=True)
+    dest = os.path.join(_OUTPUT_DIR, f"{key}-{digest}.pdf")
+    if os.path.exists(dest):
+        os.utime(dest)  # keep it clear of _sweep()'s grace window
+    else:
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=_OUTPUT_DIR)
+        os.close(fd)
+        shutil.copyfile(rendered_path, tmp)
+        os.replace(tmp, dest)
+
+    with _manifests.transact():
+        prev = _manifests.get(key)
+        _manifests.set(key, {"fingerprints": fingerprints, "output": dest}, expire=expire)
+        if prev and prev["output"] != dest:
+            _remove(prev["output"])
+    _sweep()
+
+
+def _remove(path: str) -> None:
+    try:
+        os.unlink(path)
+    except Exception:
+        pass
+
+
+def _sweep() -> None:
+    """Delete output copies that no live manifest entry points to."""
+    _manifests.expire()
+    live = set()
+    for key in _manifests.iterkeys():
+        m = _manifests.get(key)
+        if m:
+            live.add(os.path.basename(m["output"]))
+    cutoff = time.time() - _SWEEP_GRACE
+    for entry in os.scandir(_OUTPUT_DIR):
+        if entry.name in live:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                _remove(entry.path)
+        except FileNotFoundError:
+            pass
@@ -1,9 +1,8 @@
-import io
 import os
-import tempfile
 import fitz
 import torch
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from . import manifest
 
 MODEL_NAME = "Helsinki-NLP/opus-mt-en-zh"
 
@@ -28,7 +27,9 @@ def _translate_batch(texts, tok, mdl, batch_size=12, max_new_tokens=512):
 
 
 def _extract_blocks(page: fitz.Page):
-    data, blocks = page.get_text("dict"), []
+    # 只取文本，不把图片数据解码进 dict
+    flags = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+    data, blocks = page.get_text("dict", flags=flags), []
     for b in data.get("blocks", []):
         if b.get("type", 0) != 0:  # 只要文本块
             continue
@@ -43,13 +44,12 @@ def _extract_blocks(page: fitz.Page):
     return blocks
 
 
-def _resolve_font_bytes(uploaded_font_bytes: bytes | None) -> bytes | None:
-    if uploaded_font_bytes:
-        return uploaded_font_bytes
+def _resolve_font_path(uploaded_font_path: str | None) -> str | None:
+    if uploaded_font_path:
+        return uploaded_font_path
     p = os.environ.get("DEFAULT_FONT_FILE")
     if p and os.path.exists(p):
-        with open(p, "rb") as f:
-            return f.read()
+        return p
     return None
 
 
@@ -115,47 +115,55 @@ def _write_block(new_page: fitz.Page, rect: fitz.Rect, text: str, fontfile: byte
 
 
 # --- 替换你的主函数 ---
-async def translate_pdf_en2zh(pdf_bytes: bytes, dpi: int = 144, batch_size: int = 12,
-                              font_bytes: bytes | None = None) -> bytes:
-    tok, mdl = _get_translator()
-    src = fitz.open(stream=pdf_bytes, filetype="pdf")
+async def translate_pdf_en2zh(pdf_path: str, out_path: str, dpi: int = 144, batch_size: int = 12,
+                              font_path: str | None = None, doc_id: str | None = None) -> str:
+    """Translate the PDF at pdf_path and save the result to out_path.
+
+    Both sides stay on disk: the source is opened by path so MuPDF reads
+    pages on demand instead of holding a bytes copy, and the output is
+    written straight to out_path. Returns out_path.
+
+    With a doc_id, pages whose fingerprint matches a page of the previous
+    revision are copied from that revision's output instead of being
+    re-rendered and retranslated, and the manifest is updated afterwards.
+    """
+    src = fitz.open(pdf_path, filetype="pdf")
     out = fitz.open()
+    prev_doc = None
+    fontfile = _resolve_font_path(font_path)
+    # 只有增量模式才需要指纹（以及对字体文件做摘要）
+    render_key = f"{MODEL_NAME}|{dpi}|{manifest.file_digest(fontfile)}" if doc_id else None
 
-    font_bytes = _resolve_font_bytes(font_bytes)
-    fontfile = None
-    tmp_font_path = None
-    if font_bytes:
-        # write uploaded or resolved font bytes to a temporary file and pass its path
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".ttf")
-        try:
-            tmp.write(font_bytes)
-            tmp.flush()
-            tmp.close()
-            tmp_font_path = tmp.name
-            fontfile = tmp_font_path
-        except Exception:
-            try:
-                tmp.close()
-            except Exception:
-                pass
-            try:
-                os.unlink(tmp.name)
-            except Exception:
-                pass
-            fontfile = None
-
-    for page in src:
-        blocks = _extract_blocks(page)
+    prev_index = {}
+    try:
+        prev = manifest.load(doc_id) if doc_id else None
+        if prev:
+            prev_doc = fitz.open(prev[1], filetype="pdf")
+            if prev_doc.page_count != len(prev[0]):
+                raise ValueError("cached output does not match its manifest")
+            prev_index = {fp: i for i, fp in enumerate(prev[0])}
+    except Exception as e:
+        # 缓存缺失/损坏/被并发替换都只退化为整篇重译，不影响请求
+        print(f"[translate] doc_id={doc_id!r}: previous revision unusable ({e}), rendering all pages")
+        if prev_doc is not None:
+            prev_doc.close()
+        prev_doc, prev_index = None, {}
+
+    model = {}  # 只有需要重新翻译时才加载模型
+
+    def render(page, blocks):
         # 背景：整页栅格化后贴到底图
         new_page = out.new_page(width=page.rect.width, height=page.rect.height)
         pix = page.get_pixmap(alpha=False, dpi=dpi)
         new_page.insert_image(page.rect, stream=pix.tobytes("png"))
 
         if not blocks:  # 没有可翻译文本
-            continue
+            return
 
+        if not model:
+            model["tok"], model["mdl"] = _get_translator()
         texts = [b["text"] for b in blocks]
-        zh = _translate_batch(texts, tok, mdl, batch_size=batch_size)
+        zh = _translate_batch(texts, model["tok"], model["mdl"], batch_size=batch_size)
 
         # 逐块写入（含最小尺寸规范 + 扩展 + 浮动框兜底）
         for b, t in zip(blocks, zh):
@@ -171,15 +179,58 @@ async def translate_pdf_en2zh(pdf_bytes: bytes, dpi: int = 144, batch_size: int
                     fontname="custom", fontfile=fontfile, lineheight=1.05
                 )
 
-    buf = io.BytesIO()
+    # 连续复用的页面合并成一次 insert_pdf，避免每页都重新嫁接一份嵌入字体
+    run = []  # [(src_pno, prev_pno), ...]，prev_pno 连续递增
+    reused = 0
+
+    def flush():
+        nonlocal reused
+        if not run:
+            return
+        n = out.page_count
+        try:
+            out.insert_pdf(prev_doc, from_page=run[0][1], to_page=run[-1][1])
+            reused += len(run)
+        except Exception as e:
+            print(f"[translate] pages {run[0][0]}-{run[-1][0]}: cached copy unusable ({e}), re-rendering")
+            while out.page_count > n:
+                out.delete_page(n)
+            for pno, _ in run:
+                render(src[pno], _extract_blocks(src[pno]))
+        run.clear()
+
+    fingerprints, digests = [], {}
     try:
-        out.save(buf)
-        return buf.getvalue()
+        for page in src:
+            blocks = _extract_blocks(page)
+            if render_key is None:
+                render(page, blocks)
+                continue
+            fp = manifest.page_fingerprint(page, blocks, render_key, digests)
+            fingerprints.append(fp)
+            j = prev_index.get(fp)
+            if j is not None:
+                if run and j != run[-1][1] + 1:
+                    flush()
+                run.append((page.number, j))
+                continue
+            flush()
+            render(page, blocks)
+        flush()
+
+        # 复用页来自上一版输出，与新渲染页各带一份字体；garbage=4 合并重复对象
+        out.save(out_path, garbage=4 if reused else 0)
     finally:
         out.close()
         src.close()
-        if tmp_font_path:
-            try:
-                os.unlink(tmp_font_path)
-            except Exception:
-                pass
+        if prev_doc is not None:
+            prev_doc.close()
+
+    if doc_id:
+        print(f"[translate] doc_id={doc_id!r}: reused {reused}/{len(fingerprints)} pages")
+        try:
+            manifest.store(doc_id, fingerprints, out_path)
+        except Exception as e:
+            # 缓存写失败不影响已经渲染好的结果，下次只是退化为整篇重译
+            print(f"[translate] doc_id={doc_id!r}: could not store manifest ({e})")
+    return out_path
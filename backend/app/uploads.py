@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+
+CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "200")) * 1024 * 1024
+UPLOAD_TMP_DIR = os.environ.get("UPLOAD_TMP_DIR") or None
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB limit.")
+
+
+class UploadLimitMiddleware:
+    """Reject request bodies over max_bytes before the form parser buffers them.
+
+    A declared Content-Length over the limit is refused up front; otherwise the
+    bytes coming from receive() are counted and, as soon as the running total
+    passes the limit, a 413 is sent and the app sees a client disconnect.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        too_large = PlainTextResponse(_too_large(self.max_bytes).detail, status_code=413)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received, started, rejected = 0, False, False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # answer 413 ourselves and make the app see a disconnect
+                    if not started:
+                        await too_large(scope, receive, send)
+                    rejected = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracked_send(message):
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, tracked_send)
+
+
+async def spool_upload(upload: UploadFile, suffix: str = "", max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """Stream an upload to a temp file chunk by chunk and return its path.
+
+    The caller owns the file and must remove it. Raises 413 if the file is
+    larger than max_bytes (the whole request is already capped by
+    UploadLimitMiddleware).
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TMP_DIR)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                f.write(chunk)
+    except BaseException:
+        remove_quietly(path)
+        raise
+    return path
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload into memory in chunks, enforcing max_bytes while streaming."""
+    chunks, size = [], 0
+    while chunk := await upload.read(CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_bytes:
+            raise _too_large(max_bytes)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def new_output_path(suffix: str = "") -> str:
+    """Reserve an empty temp file for a job's output and return its path."""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_TMP_DIR)
+    os.close(fd)
+    return path
+
+
+def remove_quietly(*paths: str | None) -> None:
+    for p in paths:
+        if not p:
+            continue
+        try:
+            os.unlink(p)
+        except Exception:
+            pass
@@ -0,0 +1,160 @@
+import importlib
+import os
+import time
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("diskcache")
+
+
+@pytest.fixture
+def manifest(tmp_path, monkeypatch):
+    monkeypatch.setenv("MANIFEST_DIR", str(tmp_path / "manifest"))
+    import app.manifest
+    return importlib.reload(app.manifest)
+
+
+def _make_pdf(path, texts, pos=(72, 72)):
+    doc = fitz.open()
+    for t in texts:
+        page = doc.new_page(width=300, height=300)
+        page.insert_text(pos, t, fontsize=12)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _fingerprints(manifest, path, render_key="k"):
+    digests = {}
+    with fitz.open(path) as doc:
+        return [
+            manifest.page_fingerprint(
+                page,
+                [{"bbox": b[:4], "text": b[4]} for b in page.get_text("blocks")],
+                render_key,
+                digests,
+            )
+            for page in doc
+        ]
+
+
+def test_store_load_round_trip(manifest, tmp_path):
+    pdf = _make_pdf(tmp_path / "out.pdf", ["one", "two"])
+    manifest.store("doc", ["a", "b"], pdf)
+
+    fps, out = manifest.load("doc")
+    assert fps == ["a", "b"]
+    assert out != pdf
+    with open(out, "rb") as f, open(pdf, "rb") as g:
+        assert f.read() == g.read()
+    assert manifest.load("other") is None
+
+
+def test_store_removes_previous_output(manifest, tmp_path):
+    pdf = _make_pdf(tmp_path / "out.pdf", ["one", "two"])
+    manifest.store("doc", ["a", "b"], pdf)
+    manifest.store("other", ["x"], pdf)
+    _, old = manifest.load("doc")
+    _, other = manifest.load("other")
+
+    manifest.store("doc", ["a", "c"], pdf)
+    fps, new = manifest.load("doc")
+    assert fps == ["a", "c"]
+    assert new != old
+    assert not os.path.exists(old)
+    assert os.path.exists(other)
+
+
+def test_sweep_removes_unreferenced_outputs(manifest, tmp_path):
+    pdf = _make_pdf(tmp_path / "out.pdf", ["one"])
+    manifest.store("doc", ["a"], pdf)
+    stale = os.path.join(manifest._OUTPUT_DIR, "orphan.pdf")
+    fresh = os.path.join(manifest._OUTPUT_DIR, "in-progress.tmp")
+    for p in (stale, fresh):
+        with open(p, "wb") as f:
+            f.write(b"x")
+    old = time.time() - manifest._SWEEP_GRACE - 10
+    os.utime(stale, (old, old))
+
+    manifest.store("doc", ["b"], pdf)
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    assert os.path.exists(manifest.load("doc")[1])
+
+
+def test_file_digest_memoized_per_mtime(manifest, tmp_path):
+    font = tmp_path / "font.ttf"
+    font.write_bytes(b"one")
+    first = manifest.file_digest(str(font))
+    hits = manifest._file_digest.cache_info().hits
+    assert manifest.file_digest(str(font)) == first
+    assert manifest._file_digest.cache_info().hits == hits + 1
+
+    font.write_bytes(b"two!")
+    assert manifest.file_digest(str(font)) != first
+    assert manifest.file_digest(None) == ""
+
+
+def test_fingerprint_stable(manifest, tmp_path):
+    a = _make_pdf(tmp_path / "a.pdf", ["one", "two"])
+    b = _make_pdf(tmp_path / "b.pdf", ["one", "two"])
+    fa, fb = _fingerprints(manifest, a), _fingerprints(manifest, b)
+    assert fa == fb
+    assert fa[0] != fa[1]
+    assert _fingerprints(manifest, a, render_key="other") != fa
+
+
+def test_fingerprint_changes_on_text_edit(manifest, tmp_path):
+    a = _make_pdf(tmp_path / "a.pdf", ["one", "two"])
+    b = _make_pdf(tmp_path / "b.pdf", ["one", "TWO"])
+    fa, fb = _fingerprints(manifest, a), _fingerprints(manifest, b)
+    assert fa[0] == fb[0]
+    assert fa[1] != fb[1]
+
+
+def test_fingerprint_changes_on_bbox_edit(manifest, tmp_path):
+    a = _make_pdf(tmp_path / "a.pdf", ["one"])
+    b = _make_pdf(tmp_path / "b.pdf", ["one"], pos=(72, 150))
+    assert _fingerprints(manifest, a) != _fingerprints(manifest, b)
+
+
+def _fingerprint_of(manifest, tmp_path, name, draw):
+    doc = fitz.open()
+    draw(doc.new_page(width=300, height=300))
+    path = str(tmp_path / name)
+    doc.save(path)
+    doc.close()
+    return _fingerprints(manifest, path)[0]
+
+
+@pytest.mark.parametrize("draw", [
+    lambda page, c: page.draw_rect(fitz.Rect(50, 50, 150, 150), color=None, fill=c),
+    lambda page, c: page.insert_text((72, 72), "same text", color=c),
+    lambda page, c: page.add_text_annot((100, 100), f"note {c}"),
+])
+def test_fingerprint_changes_on_style_edit(manifest, tmp_path, draw):
+    a = _fingerprint_of(manifest, tmp_path, "a.pdf", lambda p: draw(p, (1, 0, 0)))
+    b = _fingerprint_of(manifest, tmp_path, "b.pdf", lambda p: draw(p, (0, 0, 1)))
+    again = _fingerprint_of(manifest, tmp_path, "c.pdf", lambda p: draw(p, (1, 0, 0)))
+    assert a != b
+    assert a == again
+
+
+def test_fingerprint_hashes_images_once_per_xref(manifest, tmp_path):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+    pix.clear_with(200)
+    doc = fitz.open()
+    xref = 0
+    for _ in range(2):
+        page = doc.new_page(width=300, height=300)
+        xref = page.insert_image(fitz.Rect(10, 10, 100, 100), pixmap=pix, xref=xref)
+    path = str(tmp_path / "img.pdf")
+    doc.save(path)
+    doc.close()
+
+    digests = {}
+    with fitz.open(path) as doc:
+        fps = [manifest.page_fingerprint(p, [], "k", digests) for p in doc]
+    assert fps[0] == fps[1]
+    assert list(digests) == [xref]
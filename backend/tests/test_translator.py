@@ -0,0 +1,167 @@
+import asyncio
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("diskcache")
+
+
+def _stub_module(monkeypatch, name, **attrs):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        monkeypatch.setitem(sys.modules, name, types.SimpleNamespace(**attrs))
+
+
+@pytest.fixture
+def translator(tmp_path, monkeypatch):
+    """app.translator with a fresh MANIFEST_DIR and the model stubbed out."""
+    _stub_module(monkeypatch, "torch")
+    _stub_module(monkeypatch, "transformers", AutoTokenizer=None, AutoModelForSeq2SeqLM=None)
+    monkeypatch.setenv("MANIFEST_DIR", str(tmp_path / "manifest"))
+    import app.manifest
+    importlib.reload(app.manifest)
+    import app.translator
+    mod = importlib.reload(app.translator)
+
+    mod.calls = []
+
+    def fake_translate(texts, tok, mdl, batch_size=12):
+        mod.calls.extend(texts)
+        return [f"ZH {t}" for t in texts]
+
+    monkeypatch.setattr(mod, "_get_translator", lambda: (None, None))
+    monkeypatch.setattr(mod, "_translate_batch", fake_translate)
+    font = tmp_path / "font.ttf"
+    font.write_bytes(fitz.Font("tiro").buffer)
+    mod.test_font = str(font)
+    return mod
+
+
+def _make_pdf(path, texts):
+    doc = fitz.open()
+    for t in texts:
+        page = doc.new_page(width=300, height=300)
+        page.insert_text((72, 72), t, fontsize=12)
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+def _run(translator, tmp_path, texts, doc_id="doc", name="out"):
+    translator.calls.clear()
+    src = _make_pdf(tmp_path / f"{name}-src.pdf", texts)
+    out = str(tmp_path / f"{name}.pdf")
+    asyncio.run(translator.translate_pdf_en2zh(src, out, dpi=36, font_path=translator.test_font, doc_id=doc_id))
+    return out
+
+
+def _page_texts(path):
+    with fitz.open(path) as doc:
+        # _write_block may leave white-covered retries in the text layer
+        return [" / ".join(dict.fromkeys(page.get_text().splitlines())) for page in doc]
+
+
+def _font_programs(path):
+    """xrefs of embedded font files (font dicts may differ only in their widths)."""
+    with fitz.open(path) as doc:
+        return {
+            v
+            for x in range(1, doc.xref_length())
+            for k in ("FontFile", "FontFile2", "FontFile3")
+            for t, v in [doc.xref_get_key(x, k)]
+            if t == "xref"
+        }
+
+
+PAGES = [f"page {i}" for i in range(8)]
+
+
+def test_only_changed_pages_are_translated(translator, tmp_path):
+    _run(translator, tmp_path, PAGES, name="v1")
+    assert translator.calls == PAGES
+
+    edited = PAGES[:3] + ["page 3 edited"] + PAGES[4:]
+    out = _run(translator, tmp_path, edited, name="v2")
+    assert translator.calls == ["page 3 edited"]
+    assert _page_texts(out) == [f"ZH {t}" for t in edited]
+
+
+def test_no_doc_id_renders_everything(translator, tmp_path, monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError("fingerprinting without a doc_id")
+
+    monkeypatch.setattr(translator.manifest, "file_digest", unexpected)
+    monkeypatch.setattr(translator.manifest, "page_fingerprint", unexpected)
+    _run(translator, tmp_path, PAGES, doc_id=None, name="v1")
+    _run(translator, tmp_path, PAGES, doc_id=None, name="v2")
+    assert translator.calls == PAGES
+
+
+@pytest.mark.parametrize("edited", [
+    PAGES[:2] + ["inserted"] + PAGES[2:],
+    PAGES[:2] + PAGES[3:],
+    PAGES[4:] + PAGES[:4],
+])
+def test_page_order_preserved_on_insert_remove_reorder(translator, tmp_path, edited):
+    _run(translator, tmp_path, PAGES, name="v1")
+    out = _run(translator, tmp_path, edited, name="v2")
+    assert _page_texts(out) == [f"ZH {t}" for t in edited]
+    assert translator.calls == [t for t in edited if t not in PAGES]
+
+
+def test_font_and_size_stay_flat_across_revisions(translator, tmp_path):
+    full = _run(translator, tmp_path, PAGES, name="v1")
+    out = full
+    for rev in range(2, 5):
+        edited = list(PAGES)
+        edited[rev] = f"page {rev} rev {rev}"
+        out = _run(translator, tmp_path, edited, name=f"v{rev}")
+        assert len(_font_programs(out)) == len(_font_programs(full)) == 1
+    assert os.path.getsize(out) <= os.path.getsize(full) * 1.1
+
+
+def test_corrupt_cached_output_falls_back(translator, tmp_path):
+    _run(translator, tmp_path, PAGES, name="v1")
+    _, cached = translator.manifest.load("doc")
+    with open(cached, "wb") as f:
+        f.write(b"%PDF-1.7 truncated")
+
+    out = _run(translator, tmp_path, PAGES, name="v2")
+    assert translator.calls == PAGES
+    assert _page_texts(out) == [f"ZH {t}" for t in PAGES]
+
+
+def test_page_count_mismatch_falls_back(translator, tmp_path):
+    _run(translator, tmp_path, PAGES, name="v1")
+    fps, cached = translator.manifest.load("doc")
+    translator.manifest.store("doc", fps + ["extra"], cached)
+
+    _run(translator, tmp_path, PAGES, name="v2")
+    assert translator.calls == PAGES
+
+
+def test_copy_failure_rerenders_run(translator, tmp_path, monkeypatch):
+    _run(translator, tmp_path, PAGES, name="v1")
+
+    def broken(self, *args, **kwargs):
+        self.new_page()  # leave a partial page behind, like a failed graft would
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(fitz.Document, "insert_pdf", broken)
+    out = _run(translator, tmp_path, PAGES, name="v2")
+    assert translator.calls == PAGES
+    assert _page_texts(out) == [f"ZH {t}" for t in PAGES]
+
+
+def test_store_failure_does_not_fail_request(translator, tmp_path, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(translator.manifest, "store", broken)
+    out = _run(translator, tmp_path, PAGES, name="v1")
+    assert _page_texts(out) == [f"ZH {t}" for t in PAGES]
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip("multipart")
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.uploads import UploadLimitMiddleware
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, max_bytes=1000)
+
+    @app.post("/upload")
+    async def upload(f: UploadFile = File(...)):
+        return {"size": len(await f.read())}
+
+    return TestClient(app)
+
+
+def test_small_upload_passes(client):
+    r = client.post("/upload", files={"f": ("a.pdf", b"x" * 100)})
+    assert r.status_code == 200
+    assert r.json() == {"size": 100}
+
+
+def test_content_length_over_limit_rejected(client):
+    r = client.post("/upload", files={"f": ("a.pdf", b"x" * 5000)})
+    assert r.status_code == 413
+
+
+def test_streamed_body_over_limit_rejected(client):
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 500
+
+    r = client.post("/upload", content=chunks(),
+                    headers={"content-type": "multipart/form-data; boundary=zz"})
+    assert r.status_code == 413